@@ -77,12 +77,17 @@ AI智能回复过滤器插件 (AI Reply Filter)
 6. **决策执行**: 根据AI返回结果和接管模式决定是否允许触发回复
 """
 
+import asyncio
 import json
 import re
 import time
-from typing import Dict, List, Optional, Literal
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Dict, List, Optional, Literal, Set, Tuple
 
 from pydantic import Field
+from tortoise.expressions import Q, Subquery
 
 from nekro_agent.api import core
 from nekro_agent.api.message import ChatMessage
@@ -90,6 +95,7 @@ from nekro_agent.api.schemas import AgentCtx
 from nekro_agent.api.signal import MsgSignal
 from nekro_agent.models.db_chat_message import DBChatMessage
 from nekro_agent.models.db_chat_channel import DBChatChannel
+from nekro_agent.models.db_plugin_data import DBPluginData
 from nekro_agent.models.db_preset import DBPreset
 from nekro_agent.services.agent.openai import gen_openai_chat_response
 from nekro_agent.services.plugin.base import NekroPlugin, ConfigBase
@@ -174,6 +180,24 @@ class AIReplyFilterConfig(ConfigBase):
         description="判断时包含的历史消息数量。0=不使用上下文，1-20=包含最近N条消息。建议值：5-10条。带上上下文可以让AI更好地理解对话连贯性。",
     )
 
+    AI_MAX_TOKENS: int = Field(
+        default=1024,
+        title="AI判断最大输出Token数",
+        description="AI判断时允许模型输出的最大Token数。普通模型只需几十个Token；推理模型会先输出思考过程，设置过小会在返回JSON前被截断（截断时默认允许回复）。",
+    )
+
+    ENABLE_CONTEXT_INDEX: bool = Field(
+        default=False,
+        title="创建上下文查询索引",
+        description="启用后，插件初始化时在后台为聊天记录表创建上下文查询用的复合索引，不阻塞启动（PostgreSQL 下使用 CONCURRENTLY，不阻塞消息写入，创建失败留下的无效索引会在下次启动时重建）。该索引不受 Nekro Agent 数据库迁移管理，聊天记录很多、上下文查询变慢时再开启。",
+    )
+
+    ENABLE_TRIVIAL_FILTER: bool = Field(
+        default=True,
+        title="启用简单消息预过滤",
+        description="启用后，\"嗯\"、\"好的\"、纯表情/标点等简单消息直接判定为不需要回复，不再调用AI。群聊中@或回复机器人的消息仍交给AI判断。",
+    )
+
     # 消息合并配置
     ENABLE_MESSAGE_MERGE: bool = Field(
         default=False,
@@ -201,51 +225,217 @@ store = plugin.store
 
 # 硬编码的常量配置（技术细节，不需要用户配置）
 CACHE_EXPIRE_SECONDS = 300  # 缓存过期时间：5分钟
+CACHE_SWEEP_INTERVAL_SECONDS = 3600  # 过期缓存清理间隔：1小时
 AI_TIMEOUT = 10  # AI判断超时时间：10秒
 BLOCK_MODE = 1  # 阻止模式：1=阻止AI响应但保存记录
+AI_TEMPERATURE = 0.0  # AI判断温度：二分类判断取确定性输出
+PRESET_CACHE_EXPIRE_SECONDS = 60  # 频道人设缓存过期时间：1分钟
+MODEL_GROUP_CACHE_EXPIRE_SECONDS = 60  # 模型组配置缓存过期时间：1分钟
+DECISION_HASH_PERSON = b"ai_reply_filter"  # 判断结果缓存键的 BLAKE2b 个性化参数（最多16字节）
+DECISION_LRU_MAX_SIZE = 4096  # 进程内判断结果缓存的最大条目数
+CHANNEL_CACHE_MAX_SIZE = 1024  # 频道人设缓存的最大频道数
+CONTEXT_INDEX_NAME = "ix_ai_reply_filter_msg_ck_ir_ts"  # 上下文查询复合索引名
+
+# 无需调用AI即可判定为不需要回复的简单消息（比较前会去除首尾空白并转为小写）
+TRIVIAL_MESSAGES = frozenset({
+    "嗯", "嗯嗯", "恩", "哦", "哦哦", "噢", "啊", "好", "好的", "好滴", "行", "收到",
+    "哈", "哈哈", "哈哈哈", "ok", "okk", "1",
+})
+
+# 文字/数字字符匹配（不含下划线），用于识别纯表情、纯标点消息
+WORD_CHAR_PATTERN = re.compile(r"[^\W_]")
+
+# 推理模型的思考段（含输出截断导致未闭合的情况），解析判断结果前去除
+THINK_BLOCK_PATTERN = re.compile(r"<think>.*?(?:</think>|$)", re.DOTALL)
+
+# AI判断用户消息模板，下标为 是否有人设 | 是否有上下文 << 1
+USER_MESSAGE_TEMPLATES: Tuple[str, str, str, str] = (
+    # 0: 无人设、无上下文
+    "当前消息: {message}",
+    # 1: 仅人设
+    (
+        "AI助手人设信息:\n{preset}\n\n"
+        "当前消息: {message}\n\n"
+        "\n请根据上述人设信息，判断当前消息是否需要AI回复。"
+    ),
+    # 2: 仅上下文
+    (
+        "近期对话历史:\n{context}\n\n"
+        "当前消息: {message}\n\n"
+        "\n请根据上述对话上下文，判断当前消息是否需要AI回复。"
+    ),
+    # 3: 人设和上下文
+    (
+        "AI助手人设信息:\n{preset}\n\n"
+        "近期对话历史:\n{context}\n\n"
+        "当前消息: {message}\n\n"
+        "\n请根据上述人设信息 和 对话上下文，判断当前消息是否需要AI回复。"
+    ),
+)
 
 # 消息合并状态管理
-merge_tasks: Dict[str, dict] = {}  # chat_key -> {messages, ctx, task, created_at}
+merge_tasks: Dict[str, dict] = {}  # chat_key -> 正在收集的批次 {messages, ctx, timer, created_at}
 merge_locks: Dict[str, "asyncio.Lock"] = {}  # chat_key -> Lock
+merge_pending: Dict[str, int] = {}  # chat_key -> 已触发但尚未处理完的批次数
+merge_runs: Set["asyncio.Task"] = set()  # 正在处理的合并任务（保持引用避免被回收）
+
+# 进程内判断结果缓存（位于 store 之前）
+decision_lru: "OrderedDict[str, Tuple[float, bool]]" = OrderedDict()  # message_hash -> (monotonic_expire_at, decision)
+
+# 规范化后的群组ID集合（GROUP_ID_LIST 变化时重建）
+group_id_set: frozenset = frozenset()
+group_id_set_source: Optional[List[str]] = None
+
+# 进行中的AI判断（相同消息共享同一次调用）
+inflight_decisions: Dict[str, "asyncio.Task[bool]"] = {}  # message_hash -> Task
+
+# 定期清理 store 中过期判断结果的后台任务
+cache_sweep_task: Optional["asyncio.Task"] = None
+
+# 后台创建上下文查询索引的任务
+context_index_task: Optional["asyncio.Task"] = None
+
+# 模型组配置缓存: (模型组名称, 解析时间, 模型组配置)
+model_group_cache: Optional[Tuple[str, float, object]] = None
+
+# 频道人设缓存
+preset_cache: "OrderedDict[str, Tuple[float, Optional[DBPreset]]]" = OrderedDict()  # chat_key -> (monotonic_cached_at, preset)
 
 
 # region: 缓存管理
 
+# store 中的缓存值格式: "<过期时间戳>|<1或0>"，例如 "1732212345|1"
+
+@lru_cache(maxsize=8)
+def get_prompt_fingerprint(system_prompt: str) -> str:
+    """计算系统提示词的指纹（按提示词内容缓存，提示词不变时不重复计算）"""
+    return blake2b(system_prompt.encode(), digest_size=8, person=DECISION_HASH_PERSON).hexdigest()
+
+
+def lru_put(cache: OrderedDict, key: str, value, max_size: int):
+    """写入 OrderedDict 实现的LRU缓存，超出容量时淘汰最久未使用的条目"""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+
+
+def make_decision_hash(message_text: str, preset_id: Optional[int] = None, chat_key: str = "") -> str:
+    """
+    计算AI判断结果的缓存键
+
+    除消息内容外，还包含会影响判断结果的人设、上下文数量、模型组和系统提示词，
+    避免不同人设或配置的频道之间误用缓存结果。
+    使用上下文时判断还依赖频道的聊天记录，此时频道标识也加入缓存键。
+    使用带个性化参数的 BLAKE2b（标准库实现，无需额外依赖），8字节摘要即可满足本地缓存需要。
+
+    Args:
+        message_text: 消息内容
+        preset_id: 频道人设ID，未使用人设时为 None
+        chat_key: 聊天频道标识
+
+    Returns:
+        str: 16位十六进制hash
+    """
+    # 消息内容单独送入hash，避免为拼接键材料再复制一份完整消息
+    hasher = blake2b(message_text.encode(), digest_size=8, person=DECISION_HASH_PERSON)
+    hasher.update(
+        f"\x00{preset_id or ''}\x00{config.CONTEXT_MESSAGE_COUNT}\x00{config.AI_MODEL_GROUP}"
+        f"\x00{get_prompt_fingerprint(config.SYSTEM_PROMPT)}".encode()
+    )
+    if config.CONTEXT_MESSAGE_COUNT > 0:
+        hasher.update(f"\x00{chat_key}".encode())
+    return hasher.hexdigest()
+
+
+def remember_decision(message_hash: str, decision: bool, ttl: float):
+    """
+    写入进程内判断结果缓存，超出容量时淘汰最久未使用的条目
+
+    进程内缓存使用单调时钟计算过期时间，不受系统时间调整影响。
+
+    Args:
+        message_hash: 消息hash
+        decision: 判断结果
+        ttl: 剩余有效时间（秒）
+    """
+    lru_put(decision_lru, message_hash, (time.monotonic() + ttl, decision), DECISION_LRU_MAX_SIZE)
+
+
 async def get_cached_decision(message_hash: str) -> Optional[bool]:
     """获取缓存的AI判断结果"""
+    # 优先查询进程内缓存
+    entry = decision_lru.get(message_hash)
+    if entry is not None:
+        if time.monotonic() < entry[0]:
+            decision_lru.move_to_end(message_hash)
+            return entry[1]
+        del decision_lru[message_hash]
+
     cache_key = f"ai_decision_{message_hash}"
     cached_data = await store.get(store_key=cache_key)
 
     if not cached_data:
         return None
 
+    expire_at, _, flag = cached_data.partition("|")
     try:
-        data = json.loads(cached_data)
-        timestamp = data.get("timestamp", 0)
-        decision = data.get("decision")
-
-        # 检查缓存是否过期
-        if time.time() - timestamp > CACHE_EXPIRE_SECONDS:
-            core.logger.debug(f"[AI回复过滤器] 缓存已过期: {cache_key}")
-            return None
+        expire_at = float(expire_at)
+    except ValueError:
+        # 旧版本的JSON格式缓存，视为未命中，之后会被新格式覆盖
+        core.logger.debug("[AI回复过滤器] 忽略无法识别的缓存数据: {}", cache_key)
+        return None
 
-        core.logger.debug(f"[AI回复过滤器] 使用缓存结果: {decision}")
-        return decision
-    except Exception as e:
-        core.logger.error(f"[AI回复过滤器] 解析缓存数据失败: {e}")
+    # 检查缓存是否过期：store 没有原生过期机制，过期条目读到时顺便删除，避免无限堆积
+    ttl = expire_at - time.time()
+    if ttl <= 0:
+        core.logger.debug("[AI回复过滤器] 缓存已过期: {}", cache_key)
+        await store.delete(store_key=cache_key)
         return None
 
+    decision = flag == "1"
+    core.logger.debug("[AI回复过滤器] 使用缓存结果: {}", decision)
+    remember_decision(message_hash, decision, ttl)
+    return decision
+
 
 async def save_decision_to_cache(message_hash: str, decision: bool):
     """保存AI判断结果到缓存"""
     cache_key = f"ai_decision_{message_hash}"
-    cache_data = {
-        "decision": decision,
-        "timestamp": time.time(),
-    }
+    expire_at = time.time() + CACHE_EXPIRE_SECONDS
+
+    remember_decision(message_hash, decision, CACHE_EXPIRE_SECONDS)
+
+    await store.set(store_key=cache_key, value=f"{expire_at:.0f}|{'1' if decision else '0'}")
+    core.logger.debug("[AI回复过滤器] 已缓存判断结果: {} = {}", cache_key, decision)
 
-    await store.set(store_key=cache_key, value=json.dumps(cache_data))
-    core.logger.debug(f"[AI回复过滤器] 已缓存判断结果: {cache_key} = {decision}")
+
+async def purge_expired_decisions():
+    """
+    删除 store 中已过期的判断结果缓存
+
+    读取时删除只能清理被再次查询到的条目，而大多数消息内容不会重复出现，
+    因此需要定期清理。缓存值以定宽的秒级时间戳开头，按字符串比较即可在数据库中
+    直接筛选出过期条目，无需把数据读入内存；旧版本的JSON格式缓存（以 "{" 开头）一并删除。
+    """
+    try:
+        deleted = await DBPluginData.filter(
+            Q(data_value__lt=f"{time.time():.0f}|") | Q(data_value__startswith="{"),
+            plugin_key=plugin.key,
+            target_chat_key="",
+            target_user_id="",
+            data_key__startswith="ai_decision_",
+        ).delete()
+        core.logger.debug("[AI回复过滤器] 已清理 {} 条过期缓存", deleted)
+    except Exception as e:
+        core.logger.warning(f"[AI回复过滤器] 清理过期缓存失败: {e}")
+
+
+async def run_cache_sweep():
+    """启动时及之后每隔 CACHE_SWEEP_INTERVAL_SECONDS 清理一次过期缓存"""
+    while True:
+        await purge_expired_decisions()
+        await asyncio.sleep(CACHE_SWEEP_INTERVAL_SECONDS)
 
 
 # endregion: 缓存管理
@@ -278,7 +468,43 @@ async def get_context_messages(chat_key: str, limit: int) -> List[DBChatMessage]
             .limit(limit)
         )
 
-        core.logger.debug(f"[AI回复过滤器] 获取到 {len(messages)} 条上下文消息")
+        core.logger.debug("[AI回复过滤器] 获取到 {} 条上下文消息", len(messages))
+        return messages
+
+    except Exception as e:
+        core.logger.error(f"[AI回复过滤器] 获取上下文消息失败: {e}")
+        return []
+
+
+async def get_context_message_values(chat_key: str, limit: int) -> List[Dict[str, str]]:
+    """
+    获取历史消息上下文（仅查询格式化所需的字段）
+
+    与 get_context_messages 相同的查询条件，但只取出昵称、用户ID和文本内容，
+    避免加载完整的消息行和构造ORM对象。
+
+    Args:
+        chat_key: 聊天频道标识
+        limit: 获取的消息数量
+
+    Returns:
+        List[Dict[str, str]]: 历史消息字段字典列表，按时间倒序
+    """
+    if limit <= 0:
+        return []
+
+    try:
+        messages = (
+            await DBChatMessage.filter(
+                chat_key=chat_key,
+                is_recalled=False,
+            )
+            .order_by("-send_timestamp")
+            .limit(limit)
+            .values("sender_nickname", "platform_userid", "content_text")
+        )
+
+        core.logger.debug("[AI回复过滤器] 获取到 {} 条上下文消息", len(messages))
         return messages
 
     except Exception as e:
@@ -286,12 +512,12 @@ async def get_context_messages(chat_key: str, limit: int) -> List[DBChatMessage]
         return []
 
 
-def format_context_messages(messages: List[DBChatMessage]) -> str:
+def format_context_messages(messages: List[Dict[str, str]]) -> str:
     """
     格式化上下文消息为可读文本
 
     Args:
-        messages: 消息列表
+        messages: 消息字段字典列表（由 get_context_message_values 返回）
 
     Returns:
         str: 格式化后的上下文文本
@@ -299,19 +525,83 @@ def format_context_messages(messages: List[DBChatMessage]) -> str:
     if not messages:
         return ""
 
-    # 消息按时间倒序，需要反转为正序显示
-    messages = list(reversed(messages))
+    # 消息按时间倒序，反向迭代为正序显示；发送者优先使用昵称，没有则使用用户ID
+    return "\n".join(
+        f"{msg['sender_nickname'] or msg['platform_userid']}: {content}"
+        for msg in reversed(messages)
+        if (content := (msg["content_text"] or "").strip())
+    )
+
+
+async def ensure_context_index():
+    """
+    确保上下文查询所需的复合索引存在
 
-    context_lines = []
-    for msg in messages:
-        # 获取发送者昵称，如果没有则使用用户ID
-        sender = msg.sender_nickname if msg.sender_nickname else msg.platform_userid
-        # 清理消息内容
-        content = msg.content_text.strip()
-        if content:
-            context_lines.append(f"{sender}: {content}")
+    get_context_message_values 按 (chat_key, is_recalled) 过滤并按 send_timestamp 倒序取最近N条，
+    复合索引可让数据库直接定位并反向扫描，避免历史消息增多后退化为全表排序。
+    PostgreSQL 下使用 CONCURRENTLY 建索引，不会锁住表阻塞消息写入；
+    并发建索引失败或被中断时会留下 INVALID 状态的同名索引，IF NOT EXISTS 会跳过它，
+    因此先检查 pg_index.indisvalid，无效时删除后重建。
+    """
+    try:
+        db = DBChatMessage._meta.db
+        table = DBChatMessage._meta.db_table
+        is_postgres = db.capabilities.dialect == "postgres"
+        if is_postgres:
+            _, rows = await db.execute_query(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = $1",
+                [CONTEXT_INDEX_NAME],
+            )
+            if rows and not rows[0]["indisvalid"]:
+                core.logger.warning("[AI回复过滤器] 上下文查询索引 {} 无效（上次创建未完成），正在重建", CONTEXT_INDEX_NAME)
+                await db.execute_script(f'DROP INDEX CONCURRENTLY IF EXISTS "{CONTEXT_INDEX_NAME}"')
+
+        concurrently = "CONCURRENTLY " if is_postgres else ""
+        sql = (
+            f'CREATE INDEX {concurrently}IF NOT EXISTS "{CONTEXT_INDEX_NAME}" '
+            f'ON "{table}" ("chat_key", "is_recalled", "send_timestamp" DESC)'
+        )
+        await db.execute_script(sql)
+        core.logger.debug("[AI回复过滤器] 已确认上下文查询索引: {}", CONTEXT_INDEX_NAME)
+    except Exception as e:
+        # 索引只影响性能，创建失败不影响插件功能
+        core.logger.warning(f"[AI回复过滤器] 创建上下文查询索引失败: {e}")
+        return
 
-    return "\n".join(context_lines)
+    await check_context_query_plan()
+
+
+async def check_context_query_plan():
+    """
+    检查上下文查询的执行计划是否使用了索引
+
+    只在初始化时执行一次 EXPLAIN；未使用插件索引或仍需排序时输出警告，便于排查上下文查询变慢的问题。
+    """
+    try:
+        db = DBChatMessage._meta.db
+        table = DBChatMessage._meta.db_table
+        explain = "EXPLAIN QUERY PLAN" if db.capabilities.dialect == "sqlite" else "EXPLAIN"
+        sql = (
+            f'{explain} SELECT "sender_nickname", "platform_userid", "content_text" FROM "{table}" '
+            f'WHERE "chat_key" = \'\' AND "is_recalled" = FALSE '
+            f'ORDER BY "send_timestamp" DESC LIMIT {max(config.CONTEXT_MESSAGE_COUNT, 1)}'
+        )
+        _, rows = await db.execute_query(sql)
+    except Exception as e:
+        core.logger.debug("[AI回复过滤器] 获取上下文查询执行计划失败: {}", e)
+        return
+
+    plan = "\n".join(" ".join(str(value) for value in dict(row).values()) for row in rows)
+    # 使用了插件的复合索引，且没有额外的排序步骤（PostgreSQL: Sort，SQLite: USE TEMP B-TREE）
+    plan_upper = plan.upper()
+    if CONTEXT_INDEX_NAME in plan and "SORT" not in plan_upper and "TEMP B-TREE" not in plan_upper:
+        core.logger.debug("[AI回复过滤器] 上下文查询使用索引扫描:\n{}", plan)
+    else:
+        core.logger.warning(
+            "[AI回复过滤器] 上下文查询未使用索引 {} 或仍需排序（数据量很小时数据库可能选择顺序扫描，可忽略）:\n{}",
+            CONTEXT_INDEX_NAME,
+            plan,
+        )
 
 
 # endregion: 上下文消息获取
@@ -332,20 +622,23 @@ async def get_channel_preset(chat_key: str) -> Optional[DBPreset]:
     if not config.AUTO_USE_PRESET:
         return None
 
-    try:
-        # 获取频道信息
-        channel = await DBChatChannel.get_or_none(chat_key=chat_key)
-        if not channel or not channel.preset_id:
-            core.logger.debug(f"[AI回复过滤器] 频道 {chat_key} 未配置人设")
-            return None
+    # 频道与人设的绑定很少变化，优先使用缓存
+    cached = preset_cache.get(chat_key)
+    if cached and time.monotonic() - cached[0] < PRESET_CACHE_EXPIRE_SECONDS:
+        preset_cache.move_to_end(chat_key)
+        return cached[1]
 
-        # 获取人设信息
-        preset = await DBPreset.get_or_none(id=channel.preset_id)
+    try:
+        # 通过子查询一次取出频道关联的人设，避免先查频道再查人设的两次往返
+        preset = await DBPreset.filter(
+            id=Subquery(DBChatChannel.filter(chat_key=chat_key).values("preset_id")),
+        ).first()
         if preset:
-            core.logger.info(f"[AI回复过滤器] 使用频道人设: {preset.name}")
+            core.logger.debug("[AI回复过滤器] 加载频道人设: {}", preset.name)
         else:
-            core.logger.warning(f"[AI回复过滤器] 人设ID {channel.preset_id} 不存在")
+            core.logger.debug("[AI回复过滤器] 频道 {} 未配置人设或人设不存在", chat_key)
 
+        lru_put(preset_cache, chat_key, (time.monotonic(), preset), CHANNEL_CACHE_MAX_SIZE)
         return preset
 
     except Exception as e:
@@ -358,6 +651,121 @@ async def get_channel_preset(chat_key: str) -> Optional[DBPreset]:
 
 # region: AI判断逻辑
 
+def get_model_group():
+    """
+    获取AI分析使用的模型组配置
+
+    解析结果按模型组名称缓存一段时间，模型组名称变化时立即重新解析。
+
+    Returns:
+        模型组配置对象
+    """
+    global model_group_cache
+
+    now = time.monotonic()
+    if (
+        model_group_cache is None
+        or model_group_cache[0] != config.AI_MODEL_GROUP
+        or now - model_group_cache[1] >= MODEL_GROUP_CACHE_EXPIRE_SECONDS
+    ):
+        model_group_cache = (config.AI_MODEL_GROUP, now, core.config.get_model_group_info(config.AI_MODEL_GROUP))
+    return model_group_cache[2]
+
+
+def find_json_object_end(text: str, start: int) -> Optional[int]:
+    """
+    查找从 start 处的 "{" 开始的完整JSON对象的结束位置
+
+    单次扫描并计数括号深度，忽略字符串字面量中的括号，可正确处理嵌套对象。
+
+    Args:
+        text: AI返回的文本
+        start: "{" 所在下标
+
+    Returns:
+        Optional[int]: 匹配的 "}" 所在下标，对象未闭合时返回 None
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return index
+
+    return None
+
+
+def extract_decision_object(text: str) -> Optional[dict]:
+    """
+    从文本中提取AI的判断结果对象
+
+    先去掉推理模型的 <think> 思考段，再依次尝试每个 "{" 开始的完整对象，
+    跳过不是合法JSON或不含 should_reply 的片段，返回最后一个有效对象，
+    避免把说明文字或思考过程中复述的示例格式当作判断结果。
+
+    Args:
+        text: AI返回的文本
+
+    Returns:
+        Optional[dict]: 包含 should_reply 的对象，未找到时返回 None
+    """
+    text = THINK_BLOCK_PATTERN.sub("", text)
+    result = None
+    start = text.find("{")
+    while start >= 0:
+        next_start = start + 1
+        end = find_json_object_end(text, start)
+        if end is not None:
+            try:
+                candidate = json.loads(text[start:end + 1])
+            except ValueError:
+                candidate = None
+            if isinstance(candidate, dict) and "should_reply" in candidate:
+                result = candidate
+                next_start = end + 1
+        start = text.find("{", next_start)
+
+    return result
+
+
+def is_trivial_message(message_text: str) -> bool:
+    """
+    判断消息是否为无需AI判断的简单消息
+
+    简单确认/语气词，或不含任何文字数字的纯表情、纯标点消息，直接视为不需要回复。
+
+    Args:
+        message_text: 消息内容
+
+    Returns:
+        bool: True表示是简单消息，不需要回复
+    """
+    text = message_text.strip()
+    if not text:
+        return False
+    return text.lower() in TRIVIAL_MESSAGES or WORD_CHAR_PATTERN.search(text) is None
+
+
+def forget_inflight_decision(message_hash: str, task: "asyncio.Task[bool]"):
+    """判断完成后移除进行中的记录（只移除该任务自己的记录，不影响之后发起的同hash判断）"""
+    if inflight_decisions.get(message_hash) is task:
+        del inflight_decisions[message_hash]
+
+
 async def ai_should_reply(message_text: str, chat_key: str = "") -> bool:
     """
     使用AI判断是否应该回复消息
@@ -369,64 +777,80 @@ async def ai_should_reply(message_text: str, chat_key: str = "") -> bool:
     Returns:
         bool: True表示应该回复，False表示不需要回复
     """
+    # 获取频道人设（如果启用），人设ID是缓存键的一部分
+    preset = await get_channel_preset(chat_key) if config.AUTO_USE_PRESET and chat_key else None
+
     # 生成消息hash用于缓存
-    import hashlib
-    message_hash = hashlib.md5(message_text.encode()).hexdigest()
+    message_hash = make_decision_hash(message_text, preset.id if preset else None, chat_key)
+
+    # 相同消息的判断正在进行时直接等待其结果，避免并发发起重复的AI调用（也省去一次缓存查询）
+    task = inflight_decisions.get(message_hash)
+    if task is None:
+        # 尝试从缓存获取
+        cached_decision = await get_cached_decision(message_hash)
+        if cached_decision is not None:
+            return cached_decision
+
+        # 查询缓存期间可能已有相同消息发起了判断
+        task = inflight_decisions.get(message_hash)
+
+    if task is None:
+        task = asyncio.create_task(request_ai_decision(message_text, chat_key, message_hash, preset))
+        inflight_decisions[message_hash] = task
+        task.add_done_callback(lambda done: forget_inflight_decision(message_hash, done))
+    else:
+        core.logger.debug("[AI回复过滤器] 相同消息正在判断中，等待已有结果")
+
+    # shield: 某个等待方被取消时不影响其他等待方共享的判断
+    return await asyncio.shield(task)
+
+
+async def request_ai_decision(
+    message_text: str,
+    chat_key: str,
+    message_hash: str,
+    preset: Optional[DBPreset] = None,
+) -> bool:
+    """
+    调用AI判断是否应该回复消息，并缓存结果
 
-    # 尝试从缓存获取
-    cached_decision = await get_cached_decision(message_hash)
-    if cached_decision is not None:
-        return cached_decision
+    Args:
+        message_text: 消息内容
+        chat_key: 聊天频道标识（用于获取历史消息）
+        message_hash: 消息hash（缓存键）
+        preset: 频道人设，未使用人设时为 None
 
+    Returns:
+        bool: True表示应该回复，False表示不需要回复
+    """
     try:
         # 获取模型组配置
-        model_group = core.config.get_model_group_info(config.AI_MODEL_GROUP)
+        model_group = get_model_group()
 
         # 调用AI进行判断
-        core.logger.info(f"[AI回复过滤器] 调用AI分析消息: {message_text[:50]}...")
-
-        # 获取频道人设（如果启用）
-        preset = None
-        preset_text = ""
-        if chat_key:
-            preset = await get_channel_preset(chat_key)
-            if preset:
-                preset_text = f"{preset.content}"
-                core.logger.debug(f"[AI回复过滤器] 使用频道人设: {preset.name}")
+        core.logger.debug("[AI回复过滤器] 调用AI分析消息: {}...", message_text[:50])
 
         # 获取历史消息上下文
         context_text = ""
         if config.CONTEXT_MESSAGE_COUNT > 0 and chat_key:
-            context_messages = await get_context_messages(chat_key, config.CONTEXT_MESSAGE_COUNT)
-            if context_messages:
-                context_text = format_context_messages(context_messages)
-                core.logger.debug(f"[AI回复过滤器] 使用 {len(context_messages)} 条历史消息作为上下文")
+            context_messages = await get_context_message_values(chat_key, config.CONTEXT_MESSAGE_COUNT)
+            context_text = format_context_messages(context_messages)
+            if context_text:
+                core.logger.debug("[AI回复过滤器] 使用 {} 条历史消息作为上下文", len(context_messages))
 
-        # 构建用户消息内容
-        user_message_parts = []
+        preset_text = ""
+        if preset:
+            preset_text = f"{preset.content}"
+            core.logger.debug("[AI回复过滤器] 使用频道人设: {}", preset.name)
 
-        # 1. 添加人设信息（如果有）
+        # 构建用户消息内容：按是否有人设/上下文选择预先拼好的模板
         if preset_text:
-            user_message_parts.append(f"AI助手人设信息:\n{preset_text}")
-            core.logger.debug(f"[AI回复过滤器] 使用自动获取的人设进行判断")
-
-        # 2. 添加历史消息上下文（如果有）
-        if context_text:
-            user_message_parts.append(f"近期对话历史:\n{context_text}")
-
-        # 3. 添加当前消息
-        user_message_parts.append(f"当前消息: {message_text}")
-
-        # 4. 添加判断提示
-        if preset_text or context_text:
-            prompt_parts = []
-            if preset_text:
-                prompt_parts.append("人设信息")
-            if context_text:
-                prompt_parts.append("对话上下文")
-            user_message_parts.append(f"\n请根据上述{' 和 '.join(prompt_parts)}，判断当前消息是否需要AI回复。")
-
-        user_message = "\n\n".join(user_message_parts)
+            core.logger.debug("[AI回复过滤器] 使用自动获取的人设进行判断")
+        user_message = USER_MESSAGE_TEMPLATES[bool(preset_text) | bool(context_text) << 1].format(
+            preset=preset_text,
+            context=context_text,
+            message=message_text,
+        )
 
         response = await gen_openai_chat_response(
             model=model_group.CHAT_MODEL,
@@ -436,28 +860,46 @@ async def ai_should_reply(message_text: str, chat_key: str = "") -> bool:
             ],
             base_url=model_group.BASE_URL,
             api_key=model_group.API_KEY,
-            temperature=0.3,
-            max_tokens=32000,
+            temperature=AI_TEMPERATURE,
+            max_tokens=config.AI_MAX_TOKENS,
             stream_mode=True,
         )
 
         content = response.response_content.strip()
-        core.logger.debug(f"[AI回复过滤器] AI原始返回: {content}")
+        core.logger.debug("[AI回复过滤器] AI原始返回: {}", content)
 
-        # 解析JSON响应
-        json_match = re.search(r"\{.*\}", content, re.DOTALL)
-        if json_match:
-            result = json.loads(json_match.group())
-            should_reply = result.get("should_reply", True)
+        # 解析JSON响应：模型通常直接返回纯JSON，不是纯JSON时再从文本中提取
+        result = None
+        if content.startswith("{"):
+            try:
+                result = json.loads(content)
+            except ValueError:
+                pass
+        if not (isinstance(result, dict) and "should_reply" in result):
+            result = extract_decision_object(content)
+
+        if result is not None:
+            should_reply = result["should_reply"]
+        elif (
+            not content
+            or content.rfind("{") > content.rfind("}")
+            or ("<think>" in content and "</think>" not in content)
+        ):
+            # 返回为空或JSON未闭合，通常是输出达到最大Token数被截断（推理模型的思考过程较长）
+            core.logger.warning(
+                "[AI回复过滤器] AI返回可能被截断（最大输出Token数: {}），默认允许回复，推理模型请调大该配置",
+                config.AI_MAX_TOKENS,
+            )
+            should_reply = True
         else:
             # 如果无法解析JSON，默认允许回复
-            core.logger.warning(f"[AI回复过滤器] 无法解析AI返回的JSON，默认允许回复")
+            core.logger.warning("[AI回复过滤器] 无法解析AI返回的JSON，默认允许回复")
             should_reply = True
 
         # 保存到缓存
         await save_decision_to_cache(message_hash, should_reply)
 
-        core.logger.info(f"[AI回复过滤器] AI判断结果: {'需要回复' if should_reply else '不需要回复'}")
+        core.logger.info("[AI回复过滤器] AI判断结果: {}", "需要回复" if should_reply else "不需要回复")
         return should_reply
 
     except Exception as e:
@@ -471,6 +913,28 @@ async def ai_should_reply(message_text: str, chat_key: str = "") -> bool:
 
 # region: 群组过滤逻辑
 
+def normalize_group_id(group_id: str) -> str:
+    """去掉群组ID的 group_/private_ 前缀，只保留群号"""
+    return str(group_id).strip().removeprefix("group_").removeprefix("private_")
+
+
+def get_group_id_set() -> frozenset:
+    """
+    获取规范化后的群组ID集合
+
+    集合只在 GROUP_ID_LIST 对象变化时重建，每条消息的群组检查为O(1)查找。
+
+    Returns:
+        frozenset: 不带前缀的群号集合
+    """
+    global group_id_set, group_id_set_source
+
+    if group_id_set_source is not config.GROUP_ID_LIST:
+        group_id_set = frozenset(normalize_group_id(group_id) for group_id in config.GROUP_ID_LIST)
+        group_id_set_source = config.GROUP_ID_LIST
+    return group_id_set
+
+
 def should_filter_group(channel_id: str) -> bool:
     """
     判断群组是否需要应用过滤
@@ -487,40 +951,23 @@ def should_filter_group(channel_id: str) -> bool:
 
     # 智能匹配：支持带前缀和不带前缀的群组ID
     # 例如：channel_id="group_1067597714" 能匹配配置中的 "1067597714" 或 "group_1067597714"
-    is_in_list = False
-    
-    # 提取不带前缀的群号
-    channel_id_without_prefix = channel_id.replace("group_", "").replace("private_", "")
-    
-    core.logger.info(f"[AI回复过滤器] 检查群组: {channel_id} (纯ID: {channel_id_without_prefix})")
-    core.logger.info(f"[AI回复过滤器] 配置的群组列表: {config.GROUP_ID_LIST}")
-    core.logger.info(f"[AI回复过滤器] 过滤模式: {config.GROUP_FILTER_MODE}")
-    
-    for group_id in config.GROUP_ID_LIST:
-        # 清理配置中的群组ID
-        config_id_without_prefix = str(group_id).replace("group_", "").replace("private_", "")
-        
-        core.logger.info(f"[AI回复过滤器] 比对: '{channel_id_without_prefix}' vs '{config_id_without_prefix}'")
-        
-        # 匹配：只要群号相同就算匹配
-        if channel_id_without_prefix == config_id_without_prefix:
-            is_in_list = True
-            core.logger.info(f"[AI回复过滤器] ✅ 群组ID匹配成功: {channel_id} <-> {group_id}")
-            break
-    
-    if not is_in_list:
-        core.logger.info(f"[AI回复过滤器] ❌ 群组ID未匹配到任何配置")
+    channel_id_without_prefix = normalize_group_id(channel_id)
+    is_in_list = channel_id_without_prefix in get_group_id_set()
+
+    core.logger.debug(
+        "[AI回复过滤器] 检查群组: {} (纯ID: {}), 过滤模式: {}, {}",
+        channel_id,
+        channel_id_without_prefix,
+        config.GROUP_FILTER_MODE,
+        "✅ 匹配成功" if is_in_list else "❌ 未匹配到任何配置",
+    )
 
     if config.GROUP_FILTER_MODE == "白名单":
         # 白名单模式：只有在列表中的群组才过滤
-        result = is_in_list
-        core.logger.info(f"[AI回复过滤器] 白名单模式判断结果: {'需要过滤' if result else '不需要过滤'}")
-        return result
+        return is_in_list
     elif config.GROUP_FILTER_MODE == "黑名单":
         # 黑名单模式：排除列表中的群组
-        result = not is_in_list
-        core.logger.info(f"[AI回复过滤器] 黑名单模式判断结果: {'需要过滤' if result else '不需要过滤'}")
-        return result
+        return not is_in_list
 
     return True
 
@@ -530,9 +977,6 @@ def should_filter_group(channel_id: str) -> bool:
 
 # region: 消息合并逻辑
 
-import asyncio
-from copy import copy
-
 
 async def get_merge_lock(chat_key: str) -> asyncio.Lock:
     """获取或创建频道的锁"""
@@ -554,108 +998,109 @@ async def handle_with_merge(_ctx: AgentCtx, message: ChatMessage, chat_key: str)
     Returns:
         MsgSignal: 总是返回BLOCK_TRIGGER，实际回复由合并处理触发
     """
-    lock = await get_merge_lock(chat_key)
-    
-    async with lock:
-        if chat_key in merge_tasks:
-            # 已有等待任务，将消息加入队列
-            task_info = merge_tasks[chat_key]
-            task_info['messages'].append(message)
-            
-            core.logger.info(f"[消息合并] 加入消息到等待队列，当前数量: {len(task_info['messages'])}")
-            
-            # 检查是否达到最大数量
-            if config.MESSAGE_MERGE_MAX_COUNT > 0 and len(task_info['messages']) >= config.MESSAGE_MERGE_MAX_COUNT:
-                core.logger.info(f"[消息合并] 达到最大数量 {config.MESSAGE_MERGE_MAX_COUNT}，立即处理")
-                task_info['task'].cancel()
-            
-            return MsgSignal.BLOCK_TRIGGER
-        else:
-            # 创建新的等待任务
-            core.logger.info(f"[消息合并] 创建新的等待任务，等待时间: {config.MESSAGE_MERGE_WAIT_TIME}秒")
-            
-            task_info = {
-                'messages': [message],
-                'ctx': _ctx,
-                'created_at': time.time(),
-            }
-            
-            # 启动定时器
-            timer_task = asyncio.create_task(
-                wait_and_process(chat_key)
-            )
-            task_info['task'] = timer_task
-            merge_tasks[chat_key] = task_info
-            
-            return MsgSignal.BLOCK_TRIGGER
+    # 以下逻辑中间没有 await，在单线程事件循环中不会被其他协程打断，无需加锁
+    task_info = merge_tasks.get(chat_key)
+    if task_info is not None:
+        # 已有等待任务，将消息加入队列
+        task_info['messages'].append(message)
+        
+        core.logger.debug("[消息合并] 加入消息到等待队列，当前数量: {}", len(task_info['messages']))
+        
+        # 检查是否达到最大数量（已触发的批次会立即移出 merge_tasks，之后的消息进入新批次）
+        if config.MESSAGE_MERGE_MAX_COUNT > 0 and len(task_info['messages']) >= config.MESSAGE_MERGE_MAX_COUNT:
+            core.logger.debug("[消息合并] 达到最大数量 {}，立即处理", config.MESSAGE_MERGE_MAX_COUNT)
+            task_info['timer'].cancel()
+            fire_merge(chat_key, task_info)
+        
+        return MsgSignal.BLOCK_TRIGGER
+    else:
+        # 创建新的等待任务
+        core.logger.debug("[消息合并] 创建新的等待任务，等待时间: {}秒", config.MESSAGE_MERGE_WAIT_TIME)
+        
+        loop = asyncio.get_running_loop()
+        task_info = {
+            'messages': [message],
+            'ctx': _ctx,
+            'created_at': time.time(),
+        }
+        
+        # 启动定时器：到期回调只在事件循环的定时器堆中占一个条目，不额外创建等待任务
+        task_info['timer'] = loop.call_later(config.MESSAGE_MERGE_WAIT_TIME, fire_merge, chat_key, task_info)
+        merge_tasks[chat_key] = task_info
+        
+        return MsgSignal.BLOCK_TRIGGER
+
+
+def fire_merge(chat_key: str, task_info: dict):
+    """合并等待结束（到期或达到最大数量），启动对合并消息的处理"""
+    if merge_tasks.get(chat_key) is not task_info:
+        return
+    del merge_tasks[chat_key]
 
+    # 批次移出 merge_tasks 后交给处理任务，即使仍在等待前一批次，新消息也不会再加入该批次
+    merge_pending[chat_key] = merge_pending.get(chat_key, 0) + 1
+    task = asyncio.get_running_loop().create_task(run_merged_messages(chat_key, task_info))
+    merge_runs.add(task)
+    task.add_done_callback(merge_runs.discard)
 
-async def wait_and_process(chat_key: str):
-    """等待指定时间后处理合并的消息"""
+
+async def run_merged_messages(chat_key: str, task_info: dict):
+    """处理合并的消息，记录处理过程中的异常"""
     try:
-        core.logger.info(f"[消息合并] 启动等待计时器")
-        await asyncio.sleep(config.MESSAGE_MERGE_WAIT_TIME)
-        core.logger.info(f"[消息合并] 等待时间到，开始处理消息")
-        await process_merged_messages(chat_key)
-    except asyncio.CancelledError:
-        core.logger.info(f"[消息合并] 计时器被取消，立即处理消息")
-        await process_merged_messages(chat_key)
+        await process_merged_messages(chat_key, task_info)
     except Exception as e:
         core.logger.error(f"[消息合并] 等待处理异常: {e}", exc_info=True)
 
 
-async def process_merged_messages(chat_key: str):
-    """处理合并的消息并进行AI判断"""
+async def process_merged_messages(chat_key: str, task_info: dict):
+    """处理合并的消息并进行AI判断（同一频道的批次按顺序依次处理）"""
     lock = await get_merge_lock(chat_key)
 
-    async with lock:
-        if chat_key not in merge_tasks:
-            return
-
-        task_info = merge_tasks[chat_key]
-        messages = task_info['messages']
-        ctx = task_info['ctx']
-
-        # 🔍 区分用户：为每条消息标注发送者信息
-        merged_lines = []
-        for msg in messages:
-            # 获取发送者信息
-            sender_name = getattr(msg, 'sender_nickname', None) or getattr(msg, 'platform_userid', 'unknown')
-            sender_id = getattr(msg, 'sender_id', '') or getattr(msg, 'platform_userid', '')
-            content = msg.content_text
-            
+    try:
+        async with lock:
+            messages = task_info['messages']
+            ctx = task_info['ctx']
+
+            # 🔍 区分用户：为每条消息标注发送者信息
             # 格式：[发送者昵称(ID)] 消息内容
-            merged_lines.append(f"[{sender_name}({sender_id})] {content}")
-        
-        merged_content = "\n".join(merged_lines)
+            merged_content = "\n".join(
+                f"[{msg.sender_nickname or msg.platform_userid or 'unknown'}({msg.sender_id or msg.platform_userid})] {msg.content_text}"
+                for msg in messages
+            )
 
-        core.logger.info(f"[消息合并] 合并了 {len(messages)} 条消息进行处理")
-        core.logger.debug(f"[消息合并] 合并内容:\n{merged_content[:300]}...")
+            core.logger.info("[消息合并] 合并了 {} 条消息进行处理", len(messages))
+            core.logger.debug("[消息合并] 合并内容:\n{}...", merged_content[:300])
 
-        # 清理任务
-        del merge_tasks[chat_key]
+            # 对合并后的内容进行AI判断
+            should_reply = await ai_should_reply(merged_content, chat_key)
 
-        # 对合并后的内容进行AI判断
-        should_reply = await ai_should_reply(merged_content, chat_key)
+            if should_reply:
+                # AI判断需要回复,触发AI响应
+                core.logger.debug("[消息合并] AI判断需要回复,触发响应")
+                try:
+                    from nekro_agent.services.message_service import message_service
 
-        if should_reply:
-            # AI判断需要回复,触发AI响应
-            core.logger.info(f"[消息合并] AI判断需要回复,触发响应")
-            try:
-                from nekro_agent.services.message_service import message_service
+                    await message_service.push_system_message(
+                        chat_key=chat_key,
+                        agent_messages=f"群内连续发送了 {len(messages)} 条消息,已合并:\n{merged_content}",
+                        trigger_agent=True,
+                    )
 
-                await message_service.push_system_message(
-                    chat_key=chat_key,
-                    agent_messages=f"群内连续发送了 {len(messages)} 条消息,已合并:\n{merged_content}",
-                    trigger_agent=True,
-                )
-
-                core.logger.info(f"[消息合并] 成功触发AI回复")
-            except Exception as e:
-                core.logger.error(f"[消息合并] 触发AI回复失败: {e}", exc_info=True)
+                    core.logger.info("[消息合并] 成功触发AI回复")
+                except Exception as e:
+                    core.logger.error(f"[消息合并] 触发AI回复失败: {e}", exc_info=True)
+            else:
+                # AI判断不需要回复
+                core.logger.debug("[消息合并] AI判断不需要回复,忽略这批消息")
+    finally:
+        # 没有待处理的批次时释放频道锁，避免 merge_locks 随频道数量无限增长
+        remaining = merge_pending.get(chat_key, 1) - 1
+        if remaining > 0:
+            merge_pending[chat_key] = remaining
         else:
-            # AI判断不需要回复
-            core.logger.info(f"[消息合并] AI判断不需要回复,忽略这批消息")
+            merge_pending.pop(chat_key, None)
+            if merge_locks.get(chat_key) is lock:
+                del merge_locks[chat_key]
 
 
 # endregion: 消息合并逻辑
@@ -666,12 +1111,24 @@ async def process_merged_messages(chat_key: str):
 @plugin.mount_init_method()
 async def initialize_plugin():
     """插件初始化"""
+    global cache_sweep_task, context_index_task
+
     core.logger.info(f"插件 '{plugin.name}' 正在初始化...")
 
+    # 定期清理 store 中的过期判断结果
+    if cache_sweep_task is None or cache_sweep_task.done():
+        cache_sweep_task = asyncio.create_task(run_cache_sweep())
+
+    # 为上下文查询建立复合索引（需手动开启）：大表建索引耗时较长，放到后台执行，不阻塞初始化
+    if config.ENABLE_CONTEXT_INDEX and config.CONTEXT_MESSAGE_COUNT > 0:
+        if context_index_task is None or context_index_task.done():
+            context_index_task = asyncio.create_task(ensure_context_index())
+
     # 验证配置
     if config.ENABLE_PRIVATE or config.ENABLE_GROUP:
         try:
-            model_group = core.config.get_model_group_info(config.AI_MODEL_GROUP)
+            # 同时预热模型组缓存，首条消息无需再解析
+            model_group = get_model_group()
             core.logger.info(f"[AI回复过滤器] 使用模型组: {config.AI_MODEL_GROUP}")
             core.logger.info(f"[AI回复过滤器] 模型: {model_group.CHAT_MODEL}")
         except Exception as e:
@@ -687,6 +1144,10 @@ async def initialize_plugin():
         core.logger.info(f"[AI回复过滤器] 消息合并等待时间: {config.MESSAGE_MERGE_WAIT_TIME}秒")
         core.logger.info(f"[AI回复过滤器] 最大合并消息数: {config.MESSAGE_MERGE_MAX_COUNT}")
 
+    # 预热热路径上的派生数据：群组ID集合、系统提示词指纹
+    get_group_id_set()
+    get_prompt_fingerprint(config.SYSTEM_PROMPT)
+
     core.logger.success(f"插件 '{plugin.name}' 初始化完成。")
 
 
@@ -711,65 +1172,72 @@ async def handle_user_message(_ctx: AgentCtx, message: ChatMessage) -> MsgSignal
             - None: 允许正常处理
     """
     try:
-        core.logger.info("[AI回复过滤器] 用户消息回调被触发")
-
         # 获取频道类型
         channel_type = getattr(_ctx, "channel_type", None)
         channel_id = getattr(_ctx, "channel_id", "unknown")
 
-        core.logger.info(f"[AI回复过滤器] 频道类型: {channel_type}, 频道ID: {channel_id}")
-
         # 检查频道类型是否启用过滤
         if channel_type == "private" and not config.ENABLE_PRIVATE:
-            core.logger.info("[AI回复过滤器] 私聊过滤已禁用，直接放行")
+            core.logger.debug("[AI回复过滤器] 私聊过滤已禁用，直接放行")
             return None
         elif channel_type == "group" and not config.ENABLE_GROUP:
-            core.logger.info("[AI回复过滤器] 群聊过滤已禁用，直接放行")
+            core.logger.debug("[AI回复过滤器] 群聊过滤已禁用，直接放行")
             return None
         elif channel_type not in ["private", "group"]:
-            core.logger.info(f"[AI回复过滤器] 未知频道类型 ({channel_type})，直接放行")
+            core.logger.debug("[AI回复过滤器] 未知频道类型 ({})，直接放行", channel_type)
             return None
 
         # 群组过滤检查
         if channel_type == "group":
             if not should_filter_group(channel_id):
-                core.logger.info(f"[AI回复过滤器] 群组 {channel_id} 不在过滤范围内，直接放行")
+                core.logger.debug("[AI回复过滤器] 群组 {} 不在过滤范围内，直接放行", channel_id)
                 return None
 
         # 获取消息内容
         message_text = message.content_text
-        core.logger.info(f"[AI回复过滤器] 分析消息: {message_text[:100]}...")
 
         # 获取 chat_key 用于查询历史消息
         chat_key = getattr(_ctx, "chat_key", "")
 
-        # 🔍 调试日志：输出当前配置值
-        core.logger.info(f"[AI回复过滤器] 📋 配置检查 - ENABLE_MESSAGE_MERGE: {config.ENABLE_MESSAGE_MERGE}")
-        core.logger.info(f"[AI回复过滤器] 📋 配置检查 - MESSAGE_MERGE_WAIT_TIME: {config.MESSAGE_MERGE_WAIT_TIME}")
-        core.logger.info(f"[AI回复过滤器] 📋 配置检查 - MESSAGE_MERGE_MAX_COUNT: {config.MESSAGE_MERGE_MAX_COUNT}")
-
         # 修复: 如果启用消息合并模式,直接收集消息,不立即AI判断
         if config.ENABLE_MESSAGE_MERGE:
-            core.logger.info("[AI回复过滤器] 启用消息合并模式,先收集消息")
+            core.logger.debug("[AI回复过滤器] 频道 {} 收到消息,进入消息合并: {}", chat_key, message_text[:100])
             return await handle_with_merge(_ctx, message, chat_key)
 
-        # 未启用消息合并模式,立即调用AI判断
-        should_reply = await ai_should_reply(message_text, chat_key)
+        # 未启用消息合并模式,立即判断：简单消息结果是确定的,无需调用AI
+        # 群聊中@或回复机器人的消息仍交给AI判断；私聊消息的 is_tome 恒为真,不作区分
+        if (
+            config.ENABLE_TRIVIAL_FILTER
+            and not (channel_type == "group" and getattr(message, "is_tome", False))
+            and is_trivial_message(message_text)
+        ):
+            source = "简单消息"
+            should_reply = False
+        else:
+            source = "AI"
+            should_reply = await ai_should_reply(message_text, chat_key)
 
         if should_reply:
-            # AI判断需要回复,立即触发
-            core.logger.info("[AI回复过滤器] AI判断:需要回复,返回FORCE_TRIGGER强制触发")
-            return MsgSignal.FORCE_TRIGGER
+            # 需要回复,立即触发
+            signal = MsgSignal.FORCE_TRIGGER
+        elif config.ENABLE_COMPLETE_TAKEOVER:
+            # 完全接管模式:完全阻止,包括随机回复
+            signal = MsgSignal.BLOCK_ALL
         else:
-            # AI判断不需要回复,根据完全接管模式决定返回信号
-            if config.ENABLE_COMPLETE_TAKEOVER:
-                # 完全接管模式:完全阻止,包括随机回复
-                core.logger.info("[AI回复过滤器] AI判断:不需要回复,完全接管模式,返回BLOCK_ALL完全阻止")
-                return MsgSignal.BLOCK_ALL
-            else:
-                # 非完全接管模式:阻止触发但保存记录,允许随机回复
-                core.logger.info("[AI回复过滤器] AI判断:不需要回复,返回BLOCK_TRIGGER(允许随机回复)")
-                return MsgSignal.BLOCK_TRIGGER
+            # 非完全接管模式:阻止触发但保存记录,允许随机回复
+            signal = MsgSignal.BLOCK_TRIGGER
+
+        core.logger.debug(
+            "[AI回复过滤器] 消息判断: chat_key={} type={} id={} source={} should_reply={} signal={} text={}",
+            chat_key,
+            channel_type,
+            channel_id,
+            source,
+            should_reply,
+            signal,
+            message_text[:100],
+        )
+        return signal
 
     except Exception as e:
         # 异常情况默认放行并触发，避免阻塞正常对话
@@ -786,7 +1254,26 @@ async def handle_user_message(_ctx: AgentCtx, message: ChatMessage) -> MsgSignal
 @plugin.mount_cleanup_method()
 async def clean_up():
     """清理插件资源"""
+    global model_group_cache, group_id_set_source, cache_sweep_task, context_index_task
+
     core.logger.info("[AI回复过滤器] 插件正在清理资源...")
+    if cache_sweep_task is not None:
+        cache_sweep_task.cancel()
+        cache_sweep_task = None
+    if context_index_task is not None:
+        context_index_task.cancel()
+        context_index_task = None
+    for task_info in merge_tasks.values():
+        task_info['timer'].cancel()
+    merge_tasks.clear()
+    merge_locks.clear()
+    merge_pending.clear()
+    decision_lru.clear()
+    preset_cache.clear()
+    inflight_decisions.clear()
+    get_prompt_fingerprint.cache_clear()
+    model_group_cache = None
+    group_id_set_source = None
     core.logger.info("[AI回复过滤器] 清理完成")
 
 